@@ -4,9 +4,10 @@ MasterAgent Fix - Temporary solution for the missing select_active_strategy meth
 This provides a minimal implementation to fix the AttributeError
 """
 
+import math
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 class MasterAgent:
     """
@@ -171,6 +172,9 @@ class MasterAgent:
             signal = position.get('signal', 'BUY')
             entry_price = position.get('entry_price', current_price)
             
+            if not (self._is_valid_price(current_price) and self._is_valid_price(entry_price)):
+                return False
+            
             # Calculate current profit percentage
             if signal == 'BUY':
                 profit_pct = (current_price - entry_price) / entry_price * 100
@@ -184,27 +188,12 @@ class MasterAgent:
                 return False
             
             # Additional conditions for trailing stop activation
-            activation_score = 0
-            
-            # Check trend strength
-            if features_df is not None and not features_df.empty:
-                latest_row = features_df.iloc[-1]
-                
-                trend_strength = latest_row.get('trend_strength', 0.5)
-                if trend_strength > 0.7:
-                    activation_score += 1
-                
-                # Check volatility
-                volatility = latest_row.get('volatility', 0.5)
-                if volatility > 0.7 or volatility < 0.4:
-                    activation_score += 0.5
-                
-                # Check momentum
-                rsi = latest_row.get('rsi', 50)
-                if signal == 'BUY' and 50 < rsi < 80:
-                    activation_score += 1
-                elif signal == 'SELL' and 20 < rsi < 50:
-                    activation_score += 1
+            factors = self._trailing_activation_factors(features_df)
+            activation_score = factors['trend'] + factors['volatility']
+            if signal == 'BUY':
+                activation_score += factors['buy_momentum']
+            elif signal == 'SELL':
+                activation_score += factors['sell_momentum']
             
             # Activate if score is sufficient
             return activation_score >= 1.5
@@ -213,6 +202,117 @@ class MasterAgent:
             print(f"⚠️ [MasterAgent] Error in trailing stop decision: {e}")
             return False
 
+    def should_activate_trailing_stops(self, positions: List[Dict[str, Any]],
+                                       current_prices: Dict[str, float],
+                                       features_by_symbol: Dict[str, pd.DataFrame]) -> List[bool]:
+        """
+        Determine trailing stop activation for all open positions in one pass
+        
+        Trend/volatility/momentum factors are computed once per symbol per call
+        and shared by every position on that symbol; the profit threshold is
+        evaluated with array ops. Malformed positions, rows with a missing or
+        invalid price, and symbols whose features cannot be scored come out
+        False just like should_activate_trailing_stop.
+        
+        Args:
+            positions: Open positions, each with a 'symbol' key
+            current_prices: Current market price keyed by symbol
+            features_by_symbol: Market features DataFrame keyed by symbol
+            
+        Returns:
+            List[bool]: Activation decision for each position, in input order
+        """
+        decisions = [False] * len(positions)
+        
+        # Score each symbol once per call; None marks a symbol whose features failed
+        symbol_factors = {}
+        rows, prices, entries, signals, factors = [], [], [], [], []
+        for i, position in enumerate(positions):
+            try:
+                symbol = position.get('symbol')
+                if symbol not in symbol_factors:
+                    try:
+                        symbol_factors[symbol] = self._trailing_activation_factors(
+                            features_by_symbol.get(symbol))
+                    except Exception as e:
+                        print(f"⚠️ [MasterAgent] Error in trailing stop factors for {symbol}: {e}")
+                        symbol_factors[symbol] = None
+                if symbol_factors[symbol] is None:
+                    continue
+                
+                current_price = current_prices.get(symbol)
+                entry_price = position.get('entry_price', current_price)
+                if not (self._is_valid_price(current_price) and self._is_valid_price(entry_price)):
+                    continue
+                signal = position.get('signal', 'BUY')
+            except Exception as e:
+                print(f"⚠️ [MasterAgent] Error reading position for trailing stop: {e}")
+                continue
+            
+            rows.append(i)
+            prices.append(current_price)
+            entries.append(entry_price)
+            signals.append(signal)
+            factors.append(symbol_factors[symbol])
+        
+        if not rows:
+            return decisions
+        
+        prices = np.array(prices, dtype=float)
+        entries = np.array(entries, dtype=float)
+        is_buy = np.array([signal == 'BUY' for signal in signals])
+        is_sell = np.array([signal == 'SELL' for signal in signals])
+        
+        # Same profit and score rules as should_activate_trailing_stop
+        profit_pct = np.where(is_buy, prices - entries, entries - prices) / entries * 100
+        base_score = np.array([f['trend'] + f['volatility'] for f in factors])
+        momentum = np.where(is_buy, [f['buy_momentum'] for f in factors],
+                            np.where(is_sell, [f['sell_momentum'] for f in factors], 0.0))
+        
+        activate = (profit_pct >= 1.5) & (base_score + momentum >= 1.5)
+        for i, active in zip(rows, activate.tolist()):
+            decisions[i] = active
+        return decisions
+    
+    @staticmethod
+    def _is_valid_price(value: Any) -> bool:
+        """Check that a price is a finite positive number"""
+        if isinstance(value, bool) or not isinstance(value, (int, float, np.integer, np.floating)):
+            return False
+        return math.isfinite(value) and value > 0
+    
+    def _trailing_activation_factors(self, features_df: pd.DataFrame) -> Dict[str, float]:
+        """
+        Score trend, volatility and momentum from the latest features row
+        
+        Returns:
+            Dict with 'trend', 'volatility', 'buy_momentum' and 'sell_momentum' scores
+        """
+        factors = {'trend': 0.0, 'volatility': 0.0, 'buy_momentum': 0.0, 'sell_momentum': 0.0}
+        if features_df is None or features_df.empty:
+            return factors
+        
+        latest_row = features_df.iloc[-1]
+        
+        # Check trend strength
+        trend_strength = latest_row.get('trend_strength', 0.5)
+        if trend_strength > 0.7:
+            factors['trend'] = 1.0
+        
+        # Check volatility
+        volatility = latest_row.get('volatility', 0.5)
+        if volatility > 0.7 or volatility < 0.4:
+            factors['volatility'] = 0.5
+        
+        # Check momentum
+        rsi = latest_row.get('rsi', 50)
+        if 50 < rsi < 80:
+            factors['buy_momentum'] = 1.0
+        if 20 < rsi < 50:
+            factors['sell_momentum'] = 1.0
+        
+        return factors
+
 # Example of how to integrate this into the bot
 def integrate_master_agent_fix():
     """
@@ -234,7 +334,94 @@ def integrate_master_agent_fix():
     print("✅ select_active_strategy method")
     print("✅ calculate_tp_sl_levels method")  
     print("✅ should_activate_trailing_stop method")
+    print("✅ should_activate_trailing_stops batch method")
     print("✅ Error handling and safe fallbacks")
 
+def test_trailing_stop_batch():
+    """Test that the batch trailing stop decision matches the per-position one"""
+    
+    print("🧪 Testing Batch Trailing Stop Decisions")
+    print("=" * 40)
+    
+    try:
+        agent = MasterAgent()
+        
+        strong_features = pd.DataFrame({
+            'trend_strength': [0.8],
+            'volatility': [0.5],
+            'rsi': [45]
+        })
+        features_by_symbol = {
+            'EURUSD': strong_features,
+            'GBPUSD': pd.DataFrame(),
+            'XAUUSD': pd.DataFrame({'trend_strength': [0.8], 'rsi': ['bad']}),
+            'USDJPY': strong_features
+        }
+        current_prices = {'EURUSD': 1.10, 'GBPUSD': 1.30, 'XAUUSD': 2400.0, 'AUDUSD': 0.66}
+        
+        positions = [
+            {'symbol': 'EURUSD', 'signal': 'BUY', 'entry_price': 1.05},   # profitable, no momentum
+            {'symbol': 'EURUSD', 'signal': 'SELL', 'entry_price': 1.15},  # profitable, momentum
+            {'symbol': 'EURUSD', 'signal': 'HOLD', 'entry_price': 1.15},  # unknown signal
+            {'symbol': 'EURUSD', 'signal': 'SELL', 'entry_price': 1.10},  # below profit threshold
+            {'symbol': 'EURUSD', 'signal': 'SELL', 'entry_price': 0},     # invalid entry
+            {'symbol': 'EURUSD', 'signal': 'SELL', 'entry_price': '1.15'},  # non-numeric entry
+            {'symbol': 'GBPUSD', 'signal': 'SELL', 'entry_price': 1.40},  # empty features
+            {'symbol': 'XAUUSD', 'signal': 'SELL', 'entry_price': 2500.0},  # bad features
+            {'symbol': 'AUDUSD', 'signal': 'SELL', 'entry_price': 0.70},  # missing features
+            {'symbol': 'USDJPY', 'signal': 'SELL', 'entry_price': 150.0},  # missing price
+        ]
+        
+        batch = agent.should_activate_trailing_stops(positions, current_prices, features_by_symbol)
+        single = [
+            agent.should_activate_trailing_stop(
+                p['symbol'], p, current_prices.get(p['symbol']), features_by_symbol.get(p['symbol']))
+            for p in positions
+        ]
+        
+        assert batch == single, f"batch {batch} != single {single}"
+        assert batch[1] is True and sum(batch) == 1, f"unexpected decisions {batch}"
+        
+        # Factors are scored once per symbol per call, not once per position
+        scored = []
+        score_factors = agent._trailing_activation_factors
+        agent._trailing_activation_factors = lambda df: scored.append(df) or score_factors(df)
+        assert agent.should_activate_trailing_stops(positions, current_prices, features_by_symbol) == batch
+        assert len(scored) == len({p['symbol'] for p in positions}), f"scored {len(scored)} times"
+        
+        # New values under the same index are rescored, not served stale
+        features_by_symbol['EURUSD'] = pd.DataFrame({
+            'trend_strength': [0.8],
+            'volatility': [0.5],
+            'rsi': [60]
+        })
+        scored.clear()
+        rescored = agent.should_activate_trailing_stops(positions, current_prices, features_by_symbol)
+        assert len(scored) == len({p['symbol'] for p in positions}), f"scored {len(scored)} times"
+        del agent._trailing_activation_factors
+        single = [
+            agent.should_activate_trailing_stop(
+                p['symbol'], p, current_prices.get(p['symbol']), features_by_symbol.get(p['symbol']))
+            for p in positions
+        ]
+        assert rescored == single, f"batch {rescored} != single {single}"
+        assert rescored[0] is True and rescored[1] is False, f"stale decisions {rescored}"
+        
+        # Malformed positions are False without aborting the batch
+        malformed = [None, 'EURUSD', {'symbol': ['EURUSD'], 'signal': 'BUY', 'entry_price': 1.05}]
+        mixed = agent.should_activate_trailing_stops(
+            malformed + positions, current_prices, features_by_symbol)
+        assert mixed == [False] * len(malformed) + rescored, f"unexpected decisions {mixed}"
+        
+        print(f"✅ SUCCESS: batch decisions match per-position decisions")
+        print(f"   Decisions: {batch}")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ FAILED: {e}")
+        return False
+
 if __name__ == "__main__":
-    integrate_master_agent_fix()
\ No newline at end of file
+    integrate_master_agent_fix()
+    test_trailing_stop_batch()
\ No newline at end of file